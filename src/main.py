@@ -1,8 +1,10 @@
+import sys
 from models.scene import Scene
 from rendering.renderer import Renderer
 
 if __name__ == '__main__':
-    scene = Scene()
+    # Opcionalmente recebe um arquivo de cena JSON (ex.: scenes/cena_padrao.json)
+    scene = Scene(sys.argv[1] if len(sys.argv) > 1 else None)
     renderer = Renderer(scene)
 
     renderer.plot_individual_solidos()
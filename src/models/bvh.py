@@ -0,0 +1,156 @@
+import heapq
+
+class _NoBVH:
+    __slots__ = ('minimo', 'maximo', 'esquerda', 'direita', 'itens', 'pai')
+
+    def __init__(self):
+        self.minimo = None
+        self.maximo = None
+        self.esquerda = None
+        self.direita = None
+        self.itens = None  # Só as folhas guardam itens
+        self.pai = None
+
+class BVH:
+    """Hierarquia de volumes envolventes (AABB) sobre itens da cena.
+
+    Cada item é associado a uma caixa (minimo, maximo). A árvore é
+    construída por divisão na mediana do eixo mais longo e, quando a caixa
+    de um item muda, apenas o caminho da folha até a raiz é reajustado.
+    """
+    MAX_FOLHA = 4
+
+    def __init__(self, itens_caixas=()):
+        self.caixas = {}  # item -> (minimo, maximo)
+        self._folhas = {}  # item -> folha que o contém
+        self.raiz = None
+        for item, (minimo, maximo) in itens_caixas:
+            self.caixas[item] = (tuple(minimo), tuple(maximo))
+        if self.caixas:
+            self.raiz = self._construir(list(self.caixas), None)
+
+    def __len__(self):
+        return len(self.caixas)
+
+    # --- CONSTRUÇÃO E ATUALIZAÇÃO ---
+
+    def _construir(self, itens, pai):
+        no = _NoBVH()
+        no.pai = pai
+        if len(itens) <= BVH.MAX_FOLHA:
+            no.itens = itens
+            for item in itens:
+                self._folhas[item] = no
+            self._ajustar(no)
+            return no
+
+        centros = {item: [(self.caixas[item][0][k] + self.caixas[item][1][k]) / 2
+                          for k in range(3)] for item in itens}
+        extensao = [max(c[k] for c in centros.values()) - min(c[k] for c in centros.values())
+                    for k in range(3)]
+        eixo = extensao.index(max(extensao))
+        itens.sort(key=lambda item: centros[item][eixo])
+        meio = len(itens) // 2
+
+        no.esquerda = self._construir(itens[:meio], no)
+        no.direita = self._construir(itens[meio:], no)
+        self._ajustar(no)
+        return no
+
+    def _ajustar(self, no):
+        if no.itens is not None:
+            caixas = [self.caixas[item] for item in no.itens]
+        else:
+            caixas = [(no.esquerda.minimo, no.esquerda.maximo),
+                      (no.direita.minimo, no.direita.maximo)]
+        no.minimo = tuple(min(c[0][k] for c in caixas) for k in range(3))
+        no.maximo = tuple(max(c[1][k] for c in caixas) for k in range(3))
+
+    def atualizar(self, item, minimo, maximo):
+        """Troca a caixa de um item e reajusta os ancestrais da sua folha."""
+        self.caixas[item] = (tuple(minimo), tuple(maximo))
+        no = self._folhas[item]
+        while no is not None:
+            self._ajustar(no)
+            no = no.pai
+
+    # --- CONSULTAS ---
+
+    @staticmethod
+    def _sobrepoe(min_a, max_a, min_b, max_b):
+        return all(min_a[k] <= max_b[k] and min_b[k] <= max_a[k] for k in range(3))
+
+    @staticmethod
+    def _distancia2(ponto, minimo, maximo):
+        d2 = 0
+        for k in range(3):
+            if ponto[k] < minimo[k]:
+                d2 += (minimo[k] - ponto[k]) ** 2
+            elif ponto[k] > maximo[k]:
+                d2 += (ponto[k] - maximo[k]) ** 2
+        return d2
+
+    @staticmethod
+    def _fora_do_plano(plano, minimo, maximo):
+        # Testa o vértice da caixa mais à frente na direção da normal
+        (nx, ny, nz), d = plano
+        px = maximo[0] if nx >= 0 else minimo[0]
+        py = maximo[1] if ny >= 0 else minimo[1]
+        pz = maximo[2] if nz >= 0 else minimo[2]
+        return nx * px + ny * py + nz * pz + d < 0
+
+    def _coletar(self, aceita_no, aceita_item):
+        encontrados = []
+        if self.raiz is None:
+            return encontrados
+        pilha = [self.raiz]
+        while pilha:
+            no = pilha.pop()
+            if not aceita_no(no.minimo, no.maximo):
+                continue
+            if no.itens is not None:
+                encontrados.extend(item for item in no.itens
+                                   if aceita_item(*self.caixas[item]))
+            else:
+                pilha.append(no.direita)
+                pilha.append(no.esquerda)
+        return encontrados
+
+    def consultar_caixa(self, minimo, maximo):
+        """Itens cuja caixa intercepta a caixa (minimo, maximo)."""
+        def teste(min_no, max_no):
+            return BVH._sobrepoe(min_no, max_no, minimo, maximo)
+        return self._coletar(teste, teste)
+
+    def consultar_frustum(self, planos):
+        """Itens não totalmente fora de algum plano ((nx, ny, nz), d).
+
+        Um ponto p está dentro do plano quando n·p + d >= 0.
+        """
+        def teste(min_no, max_no):
+            return not any(BVH._fora_do_plano(p, min_no, max_no) for p in planos)
+        return self._coletar(teste, teste)
+
+    def mais_proximo(self, ponto):
+        """Retorna (item, distância) do item cuja caixa está mais perto do ponto."""
+        if self.raiz is None:
+            return None, float('inf')
+        melhor, melhor_d2 = None, float('inf')
+        contador = 0  # Desempate na heap sem comparar nós
+        heap = [(BVH._distancia2(ponto, self.raiz.minimo, self.raiz.maximo), contador, self.raiz)]
+        while heap:
+            d2, _, no = heapq.heappop(heap)
+            if d2 >= melhor_d2:
+                break
+            if no.itens is not None:
+                for item in no.itens:
+                    d2_item = BVH._distancia2(ponto, *self.caixas[item])
+                    if d2_item < melhor_d2:
+                        melhor, melhor_d2 = item, d2_item
+                continue
+            for filho in (no.esquerda, no.direita):
+                d2_filho = BVH._distancia2(ponto, filho.minimo, filho.maximo)
+                if d2_filho < melhor_d2:
+                    contador += 1
+                    heapq.heappush(heap, (d2_filho, contador, filho))
+        return melhor, melhor_d2 ** 0.5
@@ -0,0 +1,119 @@
+import math
+import sys
+from array import array
+
+QUANTIZACAO_MAX = 65535  # Posições em 16 bits sem sinal
+
+class _VerticesQuantizados:
+    """Visão somente leitura que dequantiza os vértices sob demanda."""
+    def __init__(self, malha):
+        self._malha = malha
+
+    def __len__(self):
+        return len(self._malha.posicoes) // 3
+
+    def _vertice(self, i):
+        q = self._malha.posicoes
+        o = self._malha.origem
+        p = self._malha.passo
+        return [o[0] + p[0] * q[3*i], o[1] + p[1] * q[3*i + 1], o[2] + p[2] * q[3*i + 2]]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._vertice(k) for k in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return self._vertice(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._vertice(i)
+
+class _TriangulosCompactos:
+    """Visão dos índices planos como uma sequência de triângulos (a, b, c)."""
+    def __init__(self, indices):
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices) // 3
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return tuple(self.indices[3*i:3*i + 3])
+
+    def __iter__(self):
+        it = iter(self.indices)
+        return zip(it, it, it)
+
+def tamanho_em_memoria(vertices, topo):
+    """Bytes ocupados por listas aninhadas de vértices e triângulos (objetos distintos)."""
+    vistos = set()
+    total = 0
+    for objeto in (vertices, topo):
+        pilha = [objeto]
+        while pilha:
+            atual = pilha.pop()
+            if id(atual) in vistos:
+                continue
+            vistos.add(id(atual))
+            total += sys.getsizeof(atual)
+            if isinstance(atual, (list, tuple)):
+                pilha.extend(atual)
+    return total
+
+class MalhaCompacta:
+    """Malha com posições quantizadas em 16 bits e índices em arrays planos.
+
+    Cada coordenada é guardada como q em [0, 65535] dentro da caixa da
+    malha: v = origem + passo * q. Os índices usam 16 bits quando a malha
+    tem até 65536 vértices e 32 bits caso contrário. `vertices` e `topo`
+    continuam acessíveis como sequências, dequantizadas sob demanda.
+    """
+    def __init__(self, vertices, topo):
+        n = len(vertices)
+        minimo = [min(v[k] for v in vertices) for k in range(3)]
+        maximo = [max(v[k] for v in vertices) for k in range(3)]
+        self.origem = tuple(minimo)
+        self.passo = tuple((maximo[k] - minimo[k]) / QUANTIZACAO_MAX or 1.0 for k in range(3))
+
+        self.posicoes = array('H', bytes(2 * 3 * n))
+        erro = 0.0
+        for i, v in enumerate(vertices):
+            desvio = 0.0
+            for k in range(3):
+                q = round((v[k] - self.origem[k]) / self.passo[k])
+                self.posicoes[3*i + k] = q
+                desvio += (self.origem[k] + self.passo[k] * q - v[k]) ** 2
+            erro = max(erro, desvio)
+        self.erro_maximo = math.sqrt(erro)  # Maior distância entre vértice original e dequantizado
+
+        self.indices = array('H' if n <= QUANTIZACAO_MAX + 1 else 'I')
+        for tri in topo:
+            self.indices.extend(tri)
+
+        self.bytes_original = tamanho_em_memoria(vertices, topo)
+        self.vertices = _VerticesQuantizados(self)
+        self.topo = _TriangulosCompactos(self.indices)
+
+    @staticmethod
+    def de_malha(malha):
+        return MalhaCompacta(malha.vertices, malha.topo)
+
+    @property
+    def bytes_compacto(self):
+        return sys.getsizeof(self.posicoes) + sys.getsizeof(self.indices)
+
+    def relatorio(self):
+        """Economia de memória e erro máximo de posição da quantização."""
+        return {
+            'vertices': len(self.vertices),
+            'triangulos': len(self.topo),
+            'bits_indices': 8 * self.indices.itemsize,
+            'bytes_original': self.bytes_original,
+            'bytes_compacto': self.bytes_compacto,
+            'economia': 1 - self.bytes_compacto / self.bytes_original if self.bytes_original else 0.0,
+            'erro_maximo': self.erro_maximo,
+        }
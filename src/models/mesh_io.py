@@ -0,0 +1,196 @@
+import math
+import os
+import struct
+from .solids import Malha
+
+# Número de triângulos (ou vértices) escritos/lidos por bloco. Limita a
+# memória intermediária independentemente do tamanho da malha.
+TAMANHO_BLOCO = 4096
+
+_STL_TRIANGULO = struct.Struct('<12fH')
+
+# Tipos escalares do PLY -> código do struct
+_PLY_TIPOS = {
+    'char': 'b', 'int8': 'b', 'uchar': 'B', 'uint8': 'B',
+    'short': 'h', 'int16': 'h', 'ushort': 'H', 'uint16': 'H',
+    'int': 'i', 'int32': 'i', 'uint': 'I', 'uint32': 'I',
+    'float': 'f', 'float32': 'f', 'double': 'd', 'float64': 'd',
+}
+
+def _normal(a, b, c):
+    u = [b[k] - a[k] for k in range(3)]
+    v = [c[k] - a[k] for k in range(3)]
+    n = [u[1]*v[2] - u[2]*v[1], u[2]*v[0] - u[0]*v[2], u[0]*v[1] - u[1]*v[0]]
+    norma = math.sqrt(n[0]*n[0] + n[1]*n[1] + n[2]*n[2])
+    return [x / norma for x in n] if norma != 0 else [0.0, 0.0, 0.0]
+
+# --- EXPORTAÇÃO ---
+
+def exportar_stl(vertices, topo, caminho, nome='SolidosComputacaoGrafica'):
+    """Grava a malha em STL binário, em blocos de TAMANHO_BLOCO triângulos."""
+    pack = _STL_TRIANGULO.pack
+    with open(caminho, 'wb') as f:
+        f.write(nome.encode('ascii', 'replace')[:80].ljust(80, b'\0'))
+        f.write(struct.pack('<I', len(topo)))
+        for inicio in range(0, len(topo), TAMANHO_BLOCO):
+            bloco = bytearray()
+            for tri in topo[inicio:inicio + TAMANHO_BLOCO]:
+                a, b, c = vertices[tri[0]], vertices[tri[1]], vertices[tri[2]]
+                bloco += pack(*_normal(a, b, c), *a, *b, *c, 0)
+            f.write(bloco)
+
+def exportar_ply(vertices, topo, caminho):
+    """Grava a malha em PLY binário (little endian), em blocos."""
+    cabecalho = (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        f"element vertex {len(vertices)}\n"
+        "property float x\nproperty float y\nproperty float z\n"
+        f"element face {len(topo)}\n"
+        "property list uchar int vertex_indices\n"
+        "end_header\n"
+    )
+    pack_vertice = struct.Struct('<3f').pack
+    pack_face = struct.Struct('<B3i').pack
+    with open(caminho, 'wb') as f:
+        f.write(cabecalho.encode('ascii'))
+        for inicio in range(0, len(vertices), TAMANHO_BLOCO):
+            f.write(b''.join(pack_vertice(*v) for v in vertices[inicio:inicio + TAMANHO_BLOCO]))
+        for inicio in range(0, len(topo), TAMANHO_BLOCO):
+            f.write(b''.join(pack_face(3, *tri) for tri in topo[inicio:inicio + TAMANHO_BLOCO]))
+
+def exportar_obj(vertices, topo, caminho):
+    """Grava a malha em OBJ (texto), em blocos."""
+    with open(caminho, 'w', encoding='ascii') as f:
+        for inicio in range(0, len(vertices), TAMANHO_BLOCO):
+            f.write(''.join(f"v {v[0]!r} {v[1]!r} {v[2]!r}\n"
+                            for v in vertices[inicio:inicio + TAMANHO_BLOCO]))
+        for inicio in range(0, len(topo), TAMANHO_BLOCO):
+            f.write(''.join(f"f {t[0] + 1} {t[1] + 1} {t[2] + 1}\n"
+                            for t in topo[inicio:inicio + TAMANHO_BLOCO]))
+
+EXPORTADORES = {'.stl': exportar_stl, '.ply': exportar_ply, '.obj': exportar_obj}
+
+def exportar_malha(vertices, topo, caminho):
+    """Escolhe o formato pela extensão do arquivo (.stl, .ply ou .obj)."""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in EXPORTADORES:
+        raise ValueError(f"Formato de malha não suportado: {extensao}")
+    EXPORTADORES[extensao](vertices, topo, caminho)
+
+# --- IMPORTAÇÃO ---
+
+def importar_stl(caminho):
+    """Lê um STL binário, unindo vértices repetidos entre triângulos."""
+    vertices = []
+    topo = []
+    indices = {}
+    with open(caminho, 'rb') as f:
+        f.read(80)
+        (n_triangulos,) = struct.unpack('<I', f.read(4))
+        restantes = n_triangulos
+        while restantes > 0:
+            n = min(restantes, TAMANHO_BLOCO)
+            dados = f.read(n * _STL_TRIANGULO.size)
+            if len(dados) != n * _STL_TRIANGULO.size:
+                raise ValueError(f"STL truncado: {caminho}")
+            for valores in _STL_TRIANGULO.iter_unpack(dados):
+                tri = []
+                for k in (3, 6, 9):
+                    chave = valores[k:k + 3]
+                    indice = indices.get(chave)
+                    if indice is None:
+                        indice = indices[chave] = len(vertices)
+                        vertices.append(list(chave))
+                    tri.append(indice)
+                topo.append(tri)
+            restantes -= n
+    return Malha(vertices, topo)
+
+def _ler_cabecalho_ply(f, caminho):
+    if f.readline().strip() != b'ply':
+        raise ValueError(f"Arquivo PLY inválido: {caminho}")
+    elementos = []  # [nome, quantidade, [(nome, tipo, tipo_contagem)]]
+    formato = None
+    while True:
+        linha = f.readline()
+        if not linha:
+            raise ValueError(f"Cabeçalho PLY incompleto: {caminho}")
+        partes = linha.decode('ascii').split()
+        if not partes or partes[0] in ('comment', 'obj_info'):
+            continue
+        if partes[0] == 'end_header':
+            break
+        if partes[0] == 'format':
+            formato = partes[1]
+        elif partes[0] == 'element':
+            elementos.append([partes[1], int(partes[2]), []])
+        elif partes[0] == 'property':
+            if partes[1] == 'list':
+                elementos[-1][2].append((partes[4], _PLY_TIPOS[partes[3]], _PLY_TIPOS[partes[2]]))
+            else:
+                elementos[-1][2].append((partes[2], _PLY_TIPOS[partes[1]], None))
+    if formato != 'binary_little_endian':
+        raise ValueError(f"Apenas PLY binary_little_endian é suportado: {caminho}")
+    return elementos
+
+def importar_ply(caminho):
+    """Lê um PLY binário little endian; polígonos viram leques de triângulos."""
+    vertices = []
+    topo = []
+    with open(caminho, 'rb') as f:
+        for nome, quantidade, propriedades in _ler_cabecalho_ply(f, caminho):
+            if any(contagem is not None for _, _, contagem in propriedades):
+                if nome != 'face' or len(propriedades) != 1:
+                    raise ValueError(f"Elemento PLY com listas não suportado: {nome}")
+                _, tipo, tipo_contagem = propriedades[0]
+                _ler_faces_ply(f, quantidade, tipo, tipo_contagem, topo)
+                continue
+
+            registro = struct.Struct('<' + ''.join(tipo for _, tipo, _ in propriedades))
+            nomes = [p[0] for p in propriedades]
+            restantes = quantidade
+            while restantes > 0:
+                n = min(restantes, TAMANHO_BLOCO)
+                dados = f.read(n * registro.size)
+                if len(dados) != n * registro.size:
+                    raise ValueError(f"PLY truncado: {caminho}")
+                if nome == 'vertex':
+                    ix, iy, iz = nomes.index('x'), nomes.index('y'), nomes.index('z')
+                    vertices.extend([v[ix], v[iy], v[iz]] for v in registro.iter_unpack(dados))
+                restantes -= n
+    return Malha(vertices, topo)
+
+def _ler_faces_ply(f, quantidade, tipo, tipo_contagem, topo):
+    contagem = struct.Struct('<' + tipo_contagem)
+    tamanho_indice = struct.calcsize('<' + tipo)
+    triangulo = struct.Struct('<' + tipo_contagem + 3 * tipo)
+    restantes = quantidade
+    while restantes > 0:
+        n = min(restantes, TAMANHO_BLOCO)
+        inicio = f.tell()
+        # Caminho rápido: o bloco inteiro é de triângulos
+        dados = f.read(n * triangulo.size)
+        if len(dados) == n * triangulo.size:
+            registros = list(triangulo.iter_unpack(dados))
+            if all(r[0] == 3 for r in registros):
+                topo.extend([r[1], r[2], r[3]] for r in registros)
+                restantes -= n
+                continue
+        # Polígonos genéricos: relê o bloco face a face
+        f.seek(inicio)
+        for _ in range(n):
+            (k,) = contagem.unpack(f.read(contagem.size))
+            indices = struct.unpack(f'<{k}{tipo}', f.read(k * tamanho_indice))
+            for j in range(1, k - 1):
+                topo.append([indices[0], indices[j], indices[j + 1]])
+        restantes -= n
+
+IMPORTADORES = {'.stl': importar_stl, '.ply': importar_ply}
+
+def importar_malha(caminho):
+    """Importa uma malha binária (.stl ou .ply) como Malha."""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in IMPORTADORES:
+        raise ValueError(f"Formato de malha não suportado: {extensao}")
+    return IMPORTADORES[extensao](caminho)
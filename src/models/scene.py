@@ -1,10 +1,169 @@
 from .solids import Cubo, Toro, CanoCurvadoHermite
+from .scene_loader import SceneLoader
+from .bvh import BVH
+from .compact_mesh import MalhaCompacta
 # , Caixa, Cone, TroncoCone, Linha
 import copy
 
+class Instancia:
+    """Cópia posicionada de uma malha da cena.
+
+    A instância guarda apenas o nome da malha compartilhada e a sua
+    transformação (escala e translação); os vértices não são duplicados.
+    Alterar a malha, a escala, a translação ou a cor avisa a cena dona da
+    instância, que incrementa a versão (invalidando os caches de câmera) e
+    reajusta a BVH.
+    """
+    def __init__(self, nome, malha, escala=(1, 1, 1), translacao=(0, 0, 0), cor=None):
+        self.nome = nome
+        self._cena = None  # Definida por Scene.adicionar_instancia
+        self._malha = malha
+        self._escala = tuple(escala)
+        self._translacao = tuple(translacao)
+        self._cor = tuple(cor) if cor is not None else None
+
+    @property
+    def malha(self):
+        return self._malha
+
+    @malha.setter
+    def malha(self, valor):
+        if self._cena is not None and valor not in self._cena.malhas:
+            raise ValueError(f"Malha desconhecida: {valor}")
+        self._malha = valor
+        self._notificar(geometria=True)
+
+    @property
+    def escala(self):
+        return self._escala
+
+    @escala.setter
+    def escala(self, valor):
+        self._escala = tuple(valor)
+        self._notificar(geometria=True)
+
+    @property
+    def translacao(self):
+        return self._translacao
+
+    @translacao.setter
+    def translacao(self, valor):
+        self._translacao = tuple(valor)
+        self._notificar(geometria=True)
+
+    @property
+    def cor(self):
+        return self._cor
+
+    @cor.setter
+    def cor(self, valor):
+        self._cor = tuple(valor) if valor is not None else None
+        self._notificar(geometria=False)
+
+    def _notificar(self, geometria):
+        if self._cena is not None:
+            self._cena._instancia_alterada(self, geometria)
+
 class Scene:
-    def __init__(self):
-        self.setup_scene() # Ao iniciar a classe chama a função setup_scene()
+    def __init__(self, arquivo=None):
+        self.malhas = {}      # nome -> sólido (com .vertices e .topo), compartilhado pelas instâncias
+        self.instancias = []  # lista de Instancia, na ordem de desenho
+        self._limites_malha = {}  # nome da malha -> (minimo, maximo) local
+        self._bvh = None  # Construída sob demanda a partir das instâncias
+        self.versao = 0  # Incrementada a cada mudança de malhas ou instâncias
+        if arquivo is None:
+            self.setup_scene() # Ao iniciar a classe chama a função setup_scene()
+        else:
+            SceneLoader.carregar(arquivo, self)
+
+    def adicionar_malha(self, nome, malha):
+        self.malhas[nome] = malha
+        self._limites_malha.pop(nome, None)
+        self._bvh = None
+        self.versao += 1
+        return malha
+
+    def adicionar_instancia(self, nome, malha, escala=(1,1,1), translacao=(0,0,0), cor=None):
+        if malha not in self.malhas:
+            raise ValueError(f"Malha desconhecida: {malha}")
+        instancia = Instancia(nome, malha, escala, translacao, cor)
+        instancia._cena = self
+        self.instancias.append(instancia)
+        self._bvh = None
+        self.versao += 1
+        return instancia
+
+    def definir_transformacao(self, instancia, escala=None, translacao=None):
+        """Altera a transformação de uma instância e reajusta a BVH."""
+        if escala is not None:
+            instancia._escala = tuple(escala)
+        if translacao is not None:
+            instancia._translacao = tuple(translacao)
+        self._instancia_alterada(instancia, geometria=True)
+
+    def _instancia_alterada(self, instancia, geometria):
+        """Chamada pela instância quando sua malha, transformação ou cor muda."""
+        self.versao += 1
+        if geometria and self._bvh is not None:
+            self._bvh.atualizar(instancia, *self.caixa_instancia(instancia))
+
+    def compactar_malhas(self, nomes=None):
+        """Troca as malhas por MalhaCompacta; retorna o relatório de cada uma."""
+        relatorios = {}
+        for nome in list(self.malhas) if nomes is None else nomes:
+            malha = self.malhas[nome]
+            if not isinstance(malha, MalhaCompacta):
+                malha = self.adicionar_malha(nome, MalhaCompacta.de_malha(malha))
+            relatorios[nome] = malha.relatorio()
+        return relatorios
+
+    def limites_malha(self, nome):
+        if nome not in self._limites_malha:
+            vertices = self.malhas[nome].vertices
+            self._limites_malha[nome] = (
+                tuple(min(v[k] for v in vertices) for k in range(3)),
+                tuple(max(v[k] for v in vertices) for k in range(3))
+            )
+        return self._limites_malha[nome]
+
+    def caixa_instancia(self, instancia):
+        """Caixa alinhada aos eixos da instância no sistema do mundo."""
+        minimo, maximo = self.limites_malha(instancia.malha)
+        a = [minimo[k] * instancia.escala[k] + instancia.translacao[k] for k in range(3)]
+        b = [maximo[k] * instancia.escala[k] + instancia.translacao[k] for k in range(3)]
+        return ([min(a[k], b[k]) for k in range(3)],
+                [max(a[k], b[k]) for k in range(3)])
+
+    @property
+    def bvh(self):
+        if self._bvh is None:
+            self._bvh = BVH((inst, self.caixa_instancia(inst)) for inst in self.instancias)
+        return self._bvh
+
+    def objetos_na_caixa(self, minimo, maximo):
+        return self.bvh.consultar_caixa(minimo, maximo)
+
+    def objeto_mais_proximo(self, ponto):
+        """Retorna (instancia, distância) da instância mais próxima do ponto."""
+        return self.bvh.mais_proximo(ponto)
+
+    def instancias_por_malha(self):
+        """Agrupa as instâncias pelo nome da malha, preservando a ordem."""
+        grupos = {}
+        for instancia in self.instancias:
+            grupos.setdefault(instancia.malha, []).append(instancia)
+        return grupos
+
+    def vertices_mundo(self, instancia):
+        """Vértices da instância no sistema do mundo e a topologia da malha.
+
+        A topologia devolvida é a da malha compartilhada, sem cópia; não
+        deve ser alterada.
+        """
+        malha = self.malhas[instancia.malha]
+        (sx, sy, sz), (tx, ty, tz) = instancia.escala, instancia.translacao
+        vertices = [[x * sx + tx, y * sy + ty, z * sz + tz] for x, y, z in malha.vertices]
+        return (vertices, malha.topo)
 
     def aplicar_transformacoes(self, obj, escala=(1,1,1), translacao=(0,0,0)):
         vertices_transformados = []
@@ -25,9 +184,11 @@ class Scene:
         return (vertices_transformados, copy.deepcopy(obj.topo))
 
     def setup_scene(self):
-        self.cubo_original = Cubo(2)
-        self.toro_original = Toro(4, 2)
-        self.cano_curvado_original = CanoCurvadoHermite(
+        # Os sólidos ficam só em self.malhas; assim compactar_malhas libera
+        # de fato as malhas originais
+        cubo = Cubo(2)
+        toro = Toro(4, 2)
+        cano = CanoCurvadoHermite(
             P0=[0, 0, 0],
             P1=[6, 6, 4],
             T0=[6, 0, 4],
@@ -38,50 +199,25 @@ class Scene:
             n_secao=10,
             density=0
         )
-        # self.caixa_original = Caixa(2, 2) # Cria uma caixa com lado 2 e altura 2
-        # self.cone_original = Cone(1, 6, n=32) # Cria um cone de base 2 e altura 6
-        # self.tronco_original = TroncoCone(0.5, 1, 3, n=32) # Cria um tronco de cone de base menos 0,5, base maior 1 e altura 3
-        # self.linha_original = Linha() # Cria uma linha de tamanho 3
-
-        
-        self.cubo = self.aplicar_transformacoes(
-            self.cubo_original,
-            escala=(1,1,1),
-            translacao=(0, 6, 0)
-        )
+        # caixa = Caixa(2, 2) # Cria uma caixa com lado 2 e altura 2
+        # cone = Cone(1, 6, n=32) # Cria um cone de base 2 e altura 6
+        # tronco = TroncoCone(0.5, 1, 3, n=32) # Cria um tronco de cone de base menos 0,5, base maior 1 e altura 3
+        # linha = Linha() # Cria uma linha de tamanho 3
 
-        self.toro = self.aplicar_transformacoes(
-            self.toro_original,
-            escala=(0.3, 0.3, 0.3),
-            translacao=(3,3,1)
-        )
+        self.adicionar_malha('cubo', cubo)
+        self.adicionar_malha('toro', toro)
+        self.adicionar_malha('cano', cano)
+        # self.adicionar_malha('caixa', caixa)
+        # self.adicionar_malha('cone', cone)
+        # self.adicionar_malha('tronco', tronco)
+        # self.adicionar_malha('linha', linha)
 
-        self.cano_curvado = self.aplicar_transformacoes(
-            self.cano_curvado_original,
-            escala=(0.5, 0.5, 0.5),
-            translacao=(6, 0, 1)
-        )
-        
-        # self.caixa = self.aplicar_transformacoes(
-        #     self.caixa_original,
-        #     escala=(2, 2, 2),
-        #     translacao=(0, 0, 0)
-        # )
-
-        # self.cone = self.aplicar_transformacoes(
-        #     self.cone_original,
-        #     escala=(2, 2, 1),
-        #     translacao=(8, 2, 0)
-        # )
-
-        # self.tronco = self.aplicar_transformacoes(
-        #     self.tronco_original,
-        #     escala=(2, 2, 1),
-        #     translacao=(5, 7, 0)
-        # )
-
-        # self.linha = self.aplicar_transformacoes(
-        #     self.linha_original,
-        #     escala=(1, 1, 6/3),
-        #     translacao=(8, 8, 0)
-        # )
\ No newline at end of file
+        # As instâncias só guardam a transformação; os vértices no mundo são
+        # obtidos sob demanda com vertices_mundo()
+        self.adicionar_instancia('cubo', 'cubo', escala=(1,1,1), translacao=(0, 6, 0))
+        self.adicionar_instancia('toro', 'toro', escala=(0.3, 0.3, 0.3), translacao=(3,3,1))
+        self.adicionar_instancia('cano', 'cano', escala=(0.5, 0.5, 0.5), translacao=(6, 0, 1))
+        # self.adicionar_instancia('caixa', 'caixa', escala=(2, 2, 2), translacao=(0, 0, 0))
+        # self.adicionar_instancia('cone', 'cone', escala=(2, 2, 1), translacao=(8, 2, 0))
+        # self.adicionar_instancia('tronco', 'tronco', escala=(2, 2, 1), translacao=(5, 7, 0))
+        # self.adicionar_instancia('linha', 'linha', escala=(1, 1, 6/3), translacao=(8, 8, 0))
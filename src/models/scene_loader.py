@@ -0,0 +1,74 @@
+import json
+import os
+from .solids import Cubo, Toro, CanoCurvadoHermite
+from .mesh_io import importar_malha
+from .compact_mesh import MalhaCompacta
+
+# Tipos de malha aceitos no arquivo de cena, pelo nome da classe.
+# "Arquivo" importa uma malha binária: {"tipo": "Arquivo", "parametros": {"caminho": "x.stl"}};
+# caminhos relativos são resolvidos a partir da pasta do arquivo de cena
+TIPOS_MALHA = {
+    'Cubo': Cubo,
+    'Toro': Toro,
+    'CanoCurvadoHermite': CanoCurvadoHermite,
+    'Arquivo': importar_malha,
+}
+
+class SceneLoader:
+    """Carrega cenas descritas em JSON.
+
+    Formato:
+        {
+            "malhas": {
+                "<nome>": {"tipo": "Toro", "parametros": {"R": 4, "r": 2},
+                           "compacta": false}
+            },
+            "instancias": [
+                {"nome": "toro_1", "malha": "<nome>",
+                 "escala": [1, 1, 1], "translacao": [0, 0, 0],
+                 "cor": [44, 160, 44]}
+            ]
+        }
+
+    Cada malha é gerada uma única vez; as instâncias apenas a referenciam.
+    """
+
+    @staticmethod
+    def carregar(caminho, scene):
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        SceneLoader.aplicar_descricao(dados, scene, base=os.path.dirname(caminho))
+        return scene
+
+    @staticmethod
+    def criar_malha(definicao, base=None):
+        tipo = definicao.get('tipo')
+        if tipo not in TIPOS_MALHA:
+            raise ValueError(f"Tipo de malha desconhecido: {tipo}")
+        parametros = dict(definicao.get('parametros', {}))
+        if tipo == 'Arquivo' and base is not None and 'caminho' in parametros:
+            parametros['caminho'] = os.path.join(base, parametros['caminho'])
+        malha = TIPOS_MALHA[tipo](**parametros)
+        if definicao.get('compacta', False):
+            malha = MalhaCompacta.de_malha(malha)
+        return malha
+
+    @staticmethod
+    def aplicar_descricao(dados, scene, base=None):
+        """Adiciona à cena as malhas e instâncias de `dados`.
+
+        `base` é a pasta usada para resolver caminhos relativos de malhas
+        do tipo "Arquivo"; sem ela, valem relativos à pasta atual.
+        """
+        for nome, definicao in dados.get('malhas', {}).items():
+            scene.adicionar_malha(nome, SceneLoader.criar_malha(definicao, base))
+
+        for i, inst in enumerate(dados.get('instancias', [])):
+            scene.adicionar_instancia(
+                inst.get('nome', f"{inst['malha']}_{i}"),
+                inst['malha'],
+                escala=inst.get('escala', (1, 1, 1)),
+                translacao=inst.get('translacao', (0, 0, 0)),
+                cor=inst.get('cor')
+            )
+        return scene
@@ -1,5 +1,11 @@
 import math
 
+class Malha:
+    """Malha genérica já pronta (por exemplo, importada de um arquivo)."""
+    def __init__(self, vertices, topo):
+        self.vertices = vertices
+        self.topo = topo
+
 class Cubo:
     def __init__(self, lado):
         self.vertices, self.topo = Cubo.cubo_malha(lado)
@@ -85,13 +91,15 @@ import math
 class CanoCurvadoHermite:
     def __init__(self, P0, P1, T0, T1,
                  raio, espessura,
-                 n_curva=20, n_secao=16, density=1):
+                 n_curva=20, n_secao=16, density=1,
+                 adaptativo=False, tolerancia=0.01):
 
         # Inicializa a malha usando os métodos da própria classe
         self.vertices, self.topo = self.cano_malha(
             P0, P1, T0, T1,
             raio, espessura,
-            n_curva, n_secao, density
+            n_curva, n_secao, density,
+            adaptativo, tolerancia
         )
 
     # --- MÉTODOS MATEMÁTICOS AUXILIARES ---
@@ -118,6 +126,27 @@ class CanoCurvadoHermite:
             for i in range(3)
         ]
 
+    @staticmethod
+    def hermite_second_derivative(P0, P1, T0, T1, t):
+        ddh00 = 12*t - 6
+        ddh10 = 6*t - 4
+        ddh01 = -12*t + 6
+        ddh11 = 6*t - 2
+        return [
+            ddh00*P0[i] + ddh10*T0[i] + ddh01*P1[i] + ddh11*T1[i]
+            for i in range(3)
+        ]
+
+    @staticmethod
+    def curvatura(P0, P1, T0, T1, t):
+        d1 = CanoCurvadoHermite.hermite_tangent(P0, P1, T0, T1, t)
+        d2 = CanoCurvadoHermite.hermite_second_derivative(P0, P1, T0, T1, t)
+        velocidade = math.sqrt(sum(x*x for x in d1))
+        if velocidade == 0:
+            return 0
+        c = CanoCurvadoHermite.cross(d1, d2)
+        return math.sqrt(sum(x*x for x in c)) / velocidade**3
+
     @staticmethod
     def cross(a, b):
         return [
@@ -168,12 +197,112 @@ class CanoCurvadoHermite:
 
         return new_vertices, new_triangles
 
+    # --- AMOSTRAGEM ADAPTATIVA ---
+
+    @staticmethod
+    def passo_por_curvatura(kappa, r_ext, tolerancia):
+        """Maior comprimento de arco cuja corda respeita a tolerância.
+
+        Numa curva de raio rho, a parede externa do cano (raio rho + r_ext)
+        tem o maior erro de corda; o ângulo theta da corda satisfaz
+        (rho + r_ext) * (1 - cos(theta/2)) <= tolerancia.
+        """
+        if kappa <= 1e-12:
+            return float('inf')
+        rho = 1 / kappa
+        cos_meio = 1 - tolerancia / (rho + r_ext)
+        theta = 2 * math.acos(cos_meio) if cos_meio > 0 else math.pi
+        return rho * min(theta, math.pi / 2)
+
+    @staticmethod
+    def amostras_adaptativas(P0, P1, T0, T1, r_ext, tolerancia, n_tabela=512, n_tabela_max=65536):
+        """Valores de t distribuídos por comprimento de arco e curvatura.
+
+        Usa uma tabela densa (t, comprimento acumulado, curvatura) e avança
+        ao longo da curva com o maior passo permitido pela curvatura máxima
+        do trecho. Como as amostras saem da tabela, ela é dobrada enquanto
+        algum intervalo for maior que o passo permitido, até n_tabela_max
+        entradas; acima disso a tolerância pode não ser respeitada.
+        """
+        cls = CanoCurvadoHermite
+        while True:
+            ts = [i / (n_tabela - 1) for i in range(n_tabela)]
+            pontos = [cls.hermite(P0, P1, T0, T1, t) for t in ts]
+            kappas = [cls.curvatura(P0, P1, T0, T1, t) for t in ts]
+            comprimento = [0.0]
+            for a, b in zip(pontos, pontos[1:]):
+                comprimento.append(comprimento[-1] + math.dist(a, b))
+            fina = all(
+                comprimento[k + 1] - comprimento[k]
+                <= cls.passo_por_curvatura(max(kappas[k], kappas[k + 1]), r_ext, tolerancia)
+                for k in range(n_tabela - 1)
+            )
+            if fina or n_tabela >= n_tabela_max:
+                break
+            n_tabela = min(2 * n_tabela - 1, n_tabela_max)  # Mantém os t anteriores
+
+        amostras = [0.0]
+        i = 0
+        while i < n_tabela - 1:
+            j = i + 1
+            kappa_max = max(kappas[i], kappas[j])
+            while j < n_tabela - 1:
+                kappa_prox = max(kappa_max, kappas[j + 1])
+                passo = cls.passo_por_curvatura(kappa_prox, r_ext, tolerancia)
+                if comprimento[j + 1] - comprimento[i] > passo:
+                    break
+                kappa_max = kappa_prox
+                j += 1
+            amostras.append(ts[j])
+            i = j
+        return amostras
+
+    @staticmethod
+    def quadro_referencia(tangente):
+        ref = [0, 0, 1]
+        if abs(sum(tangente[k]*ref[k] for k in range(3))) > 0.9:
+            ref = [0, 1, 0]
+
+        normal = CanoCurvadoHermite.normalize(CanoCurvadoHermite.cross(tangente, ref))
+        binormal = CanoCurvadoHermite.cross(tangente, normal)
+        return normal, binormal
+
+    @staticmethod
+    def quadros_transporte_paralelo(centros, tangentes):
+        """Quadros com rotação mínima (método da dupla reflexão).
+
+        Evitam a torção das seções que surge ao escolher uma referência fixa
+        em cada anel independentemente.
+        """
+        cls = CanoCurvadoHermite
+        dot = lambda a, b: a[0]*b[0] + a[1]*b[1] + a[2]*b[2]
+
+        normal, binormal = cls.quadro_referencia(tangentes[0])
+        quadros = [(normal, binormal)]
+        for i in range(len(centros) - 1):
+            v1 = [centros[i + 1][k] - centros[i][k] for k in range(3)]
+            c1 = dot(v1, v1)
+            if c1 == 0:
+                quadros.append(quadros[-1])
+                continue
+            r_l = [normal[k] - (2 / c1) * dot(v1, normal) * v1[k] for k in range(3)]
+            t_l = [tangentes[i][k] - (2 / c1) * dot(v1, tangentes[i]) * v1[k] for k in range(3)]
+            v2 = [tangentes[i + 1][k] - t_l[k] for k in range(3)]
+            c2 = dot(v2, v2)
+            if c2 != 0:
+                r_l = [r_l[k] - (2 / c2) * dot(v2, r_l) * v2[k] for k in range(3)]
+            normal = cls.normalize(r_l)
+            binormal = cls.cross(tangentes[i + 1], normal)
+            quadros.append((normal, binormal))
+        return quadros
+
     # --- GERADOR DE MALHA PRINCIPAL ---
 
     @staticmethod
     def cano_malha(P0, P1, T0, T1,
                    raio, espessura,
-                   n_curva, n_secao, density):
+                   n_curva, n_secao, density,
+                   adaptativo=False, tolerancia=0.01):
 
         vertices = []
         triangles = []
@@ -182,20 +311,25 @@ class CanoCurvadoHermite:
         r_ext = raio + espessura
         r_int = raio
 
-        # GERAÇÃO DOS VÉRTICES
-        for i in range(n_curva):
-            t = i / (n_curva - 1)
-
-            centro = cls.hermite(P0, P1, T0, T1, t)
-            tangente = cls.normalize(cls.hermite_tangent(P0, P1, T0, T1, t))
-
-            ref = [0, 0, 1]
-            if abs(sum(tangente[k]*ref[k] for k in range(3))) > 0.9:
-                ref = [0, 1, 0]
-
-            normal = cls.normalize(cls.cross(tangente, ref))
-            binormal = cls.cross(tangente, normal)
+        # AMOSTRAGEM DA CURVA
+        # No modo adaptativo os anéis seguem a curvatura (dentro da tolerância
+        # de corda) e n_curva é ignorado; os quadros usam transporte paralelo
+        if adaptativo:
+            if tolerancia <= 0:
+                raise ValueError("A tolerância do modo adaptativo deve ser positiva")
+            ts = cls.amostras_adaptativas(P0, P1, T0, T1, r_ext, tolerancia)
+        else:
+            ts = [i / (n_curva - 1) for i in range(n_curva)]
+        centros = [cls.hermite(P0, P1, T0, T1, t) for t in ts]
+        tangentes = [cls.normalize(cls.hermite_tangent(P0, P1, T0, T1, t)) for t in ts]
+        if adaptativo:
+            quadros = cls.quadros_transporte_paralelo(centros, tangentes)
+        else:
+            quadros = [cls.quadro_referencia(tangente) for tangente in tangentes]
+        n_curva = len(ts)
 
+        # GERAÇÃO DOS VÉRTICES
+        for centro, (normal, binormal) in zip(centros, quadros):
             for j in range(n_secao):
                 ang = 2 * math.pi * j / n_secao
                 c = math.cos(ang)
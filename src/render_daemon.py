@@ -0,0 +1,15 @@
+import argparse
+import asyncio
+from service.render_service import RenderService
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serviço local de renderização")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help="Caminho de um socket Unix (substitui host/porta)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    servico = RenderService(host=args.host, porta=args.porta,
+                            caminho_unix=args.unix, workers=args.workers)
+    asyncio.run(servico.servir())
@@ -0,0 +1,49 @@
+import os
+from array import array
+from PIL import Image, ImageChops
+
+class IdBuffer:
+    """Buffers por pixel com o objeto e o triângulo visíveis.
+
+    `objeto` e `triangulo` são arrays de width * height inteiros (linha a
+    linha); -1 indica fundo. O índice de objeto aponta para `instancias`.
+    """
+    def __init__(self, width, height, instancias):
+        self.width = width
+        self.height = height
+        self.instancias = instancias
+        self.objeto = array('i', [-1]) * (width * height)
+        self.triangulo = array('i', [-1]) * (width * height)
+
+    def pick(self, x, y):
+        """Retorna (instancia, índice do triângulo) sob o pixel, ou None."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        i = y * self.width + x
+        objeto = self.objeto[i]
+        if objeto < 0:
+            return None
+        return self.instancias[objeto], self.triangulo[i]
+
+    def mascara(self, instancia):
+        """Imagem 'L' com 255 onde a instância (ou índice de objeto) é visível."""
+        objeto = instancia if isinstance(instancia, int) else self.instancias.index(instancia)
+        # Tudo no PIL: 255 * (1 + o - objeto) e 255 * (1 - o + objeto), saturados
+        # em 8 bits, só valem 255 juntos quando o == objeto
+        ids = Image.frombytes('I', (self.width, self.height), self.objeto.tobytes())
+        acima = ids.point(lambda o: o * 255 + (255 - 255 * objeto)).convert('L')
+        abaixo = ids.point(lambda o: o * -255 + (255 + 255 * objeto)).convert('L')
+        return ImageChops.darker(acima, abaixo)
+
+    def salvar_mascaras(self, pasta, prefixo='mascara'):
+        """Grava uma máscara PNG por objeto visível; retorna os caminhos.
+
+        O nome do arquivo leva o índice do objeto, pois instâncias podem
+        ter o mesmo nome.
+        """
+        caminhos = []
+        for objeto in sorted(set(self.objeto) - {-1}):
+            caminho = os.path.join(pasta, f"{prefixo}_{objeto}_{self.instancias[objeto].nome}.png")
+            self.mascara(objeto).save(caminho)
+            caminhos.append(caminho)
+        return caminhos
@@ -1,8 +1,26 @@
+import math
+import time
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 from PIL import Image
 from models.scene import Scene
+from models.compact_mesh import MalhaCompacta
 from rendering.utils.math_utils import Utils
+from rendering.utils.png_writer import PNGStreamWriter
+from rendering.id_buffer import IdBuffer
+
+# Triângulos usados para estimar o custo da renderização progressiva
+AMOSTRA_CUSTO = 256
+
+# Filtros de reamostragem aceitos por rasterize_pyramid
+FILTROS = {
+    'nearest': Image.NEAREST,
+    'box': Image.BOX,
+    'bilinear': Image.BILINEAR,
+    'hamming': Image.HAMMING,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+}
 
 class Renderer:
     def __init__(self, scene: Scene):
@@ -20,6 +38,12 @@ class Renderer:
         self.eye = [5, -5, 10]
         self.at = [5, 5, 0]
         self.up = [0, 0, 1]
+        self.fov = None  # Campo de visão em graus; None ajusta a cena inteira à imagem
+        self.near = 1e-3
+        # Vértices no sistema da câmera e projetados, por câmera e versão da cena
+        self.max_cameras_cache = 4
+        self._cache_camera = {}
+        self._custo_etapa = None  # Custo por triângulo da renderização progressiva (ver _stage_cost)
 
     def _compute_camera_matrix(self, eye, at, up):
         """Calcula a matriz de rotação (R) para transformar para o sistema de câmera."""
@@ -35,6 +59,101 @@ class Renderer:
         minus_n = [-n[0], -n[1], -n[2]]
         return [u, v, minus_n]
 
+    def _cor_rgb(self, instancia):
+        if instancia.cor is not None:
+            return instancia.cor
+        return self.cores_rgb.get(instancia.malha, (128, 128, 128))
+
+    def _cor_hex(self, instancia):
+        if instancia.cor is not None:
+            return '#%02x%02x%02x' % instancia.cor
+        return self.cores.get(instancia.malha, '#808080')
+
+    def _frustum_planes(self, eye, R, tan_x=None, tan_y=None):
+        """Planos ((nx, ny, nz), d) do frustum da câmera no sistema do mundo.
+
+        Sem tan_x/tan_y (meia abertura horizontal/vertical) só o plano
+        próximo é usado, descartando o que está atrás da câmera.
+        """
+        planos_camera = [((0, 0, -1), -self.near)]
+        if tan_x is not None:
+            planos_camera += [((-1, 0, -tan_x), 0), ((1, 0, -tan_x), 0),
+                              ((0, -1, -tan_y), 0), ((0, 1, -tan_y), 0)]
+        planos = []
+        for n_cam, d_cam in planos_camera:
+            n = [sum(R[r][k] * n_cam[r] for r in range(3)) for k in range(3)]
+            planos.append((n, d_cam - sum(n[k] * eye[k] for k in range(3))))
+        return planos
+
+    def _camera_cache(self, eye, at, up):
+        """Entrada do cache para a câmera (eye, at, up) na versão atual da cena.
+
+        Entradas de versões anteriores da cena são descartadas; com mais de
+        max_cameras_cache câmeras, sai a usada há mais tempo.
+        """
+        versao = self.scene.versao
+        chave = (tuple(eye), tuple(at), tuple(up), versao)
+        entrada = self._cache_camera.pop(chave, None)
+        if entrada is not None:
+            self._cache_camera[chave] = entrada  # Volta ao fim: usada por último
+        else:
+            for antiga in [c for c in self._cache_camera if c[3] != versao]:
+                del self._cache_camera[antiga]
+            while len(self._cache_camera) >= max(1, self.max_cameras_cache):
+                del self._cache_camera[next(iter(self._cache_camera))]
+            entrada = {
+                'R': self._compute_camera_matrix(eye, at, up),
+                'camera': {},    # instancia -> vértices no sistema da câmera
+                'projecao': {},  # (d, instancia) -> vértices projetados (x', y', profundidade)
+            }
+            self._cache_camera[chave] = entrada
+        return entrada
+
+    def _camera_objects(self, eye, at, up, instancias=None):
+        """Lista (instancia, vertices na câmera, topologia) da cena.
+
+        Os vértices vêm do cache da câmera; as instâncias que faltam são
+        agrupadas por malha e transformadas juntas, numa única chamada a
+        Utils.transform_instances_to_camera. Se `instancias` for dado, só
+        essas são consideradas.
+        """
+        cache = self._camera_cache(eye, at, up)
+        camera = cache['camera']
+        if instancias is None:
+            instancias = self.scene.instancias
+
+        grupos = {}
+        for inst in instancias:
+            if inst not in camera:
+                grupos.setdefault(inst.malha, []).append(inst)
+        for nome_malha, faltando in grupos.items():
+            malha = self.scene.malhas[nome_malha]
+            transformacoes = [(inst.escala, inst.translacao) for inst in faltando]
+            if isinstance(malha, MalhaCompacta):
+                transformadas = Utils.transform_quantized_instances_to_camera(
+                    malha.posicoes, malha.origem, malha.passo,
+                    transformacoes, eye, cache['R']
+                )
+            else:
+                transformadas = Utils.transform_instances_to_camera(
+                    malha.vertices, transformacoes, eye, cache['R'])
+            camera.update(zip(faltando, transformadas))
+
+        return [(inst, camera[inst], self.scene.malhas[inst.malha].topo) for inst in instancias]
+
+    def _projected_vertices(self, inst, v_cam, d=1):
+        """Projeção perspectiva (x', y', profundidade) dos vértices, com cache."""
+        projecao = self._camera_cache(self.eye, self.at, self.up)['projecao']
+        chave = (d, inst)
+        if chave not in projecao:
+            proj = []
+            for v in v_cam:
+                p = Utils.perspective_project(v, d)
+                depth = -v[2]
+                proj.append((p[0], p[1], depth))
+            projecao[chave] = proj
+        return projecao[chave]
+
     def _plot_polyhedron(self, ax, vertices, topology, face_color, edge_color='black', is_mesh=True):
         if is_mesh:
             mesh = Poly3DCollection([[vertices[int(i)] for i in face] for face in topology],
@@ -58,13 +177,12 @@ class Renderer:
                 ax.plot3D([p0[0], p1[0]], [p0[1], p1[1]], [p0[2], p1[2]],
                           color=face_color, linewidth=3)
 
-    def _plot_scene_shapes(self, ax, vertices_dict, topology_dict, title, limits, is_3d=True):
+    def _plot_scene_shapes(self, ax, objetos, title, limits, is_3d=True):
+        """Desenha uma lista de (vertices, topologia, cor)."""
         ax.set_title(title)
         if is_3d:
-            for key in ['cubo', 'toro', 'cano']:
-                self._plot_polyhedron(ax, vertices_dict[key],
-                                      topology_dict[key],
-                                      self.cores[key])
+            for vertices, topo, color in objetos:
+                self._plot_polyhedron(ax, vertices, topo, color)
             ax.set_xlabel('X')
             ax.set_ylabel('Y')
             ax.set_zlabel('Z')
@@ -72,22 +190,21 @@ class Renderer:
             ax.set_ylim(limits[1])
             ax.set_zlim(limits[2])
         else:
-            for solid, color in [('cubo', self.cores['cubo']),
-                                 ('toro', self.cores['toro']),
-                                 ('cano', self.cores['cano'])]:
-                for tri in topology_dict[solid]:
+            for vertices, topo, color in objetos:
+                for tri in topo:
                     for i in range(len(tri)):
-                        p1 = vertices_dict[solid][tri[i % len(tri)]]
-                        p2 = vertices_dict[solid][tri[(i + 1) % len(tri)]]
+                        p1 = vertices[tri[i % len(tri)]]
+                        p2 = vertices[tri[(i + 1) % len(tri)]]
                         ax.plot([p1[0], p2[0]], [p1[1], p2[1]], color=color, linewidth=2)
             ax.set_xlabel("X'")
             ax.set_ylabel("Y'")
             ax.set_aspect('equal')
 
     def plot_scene(self, ax=None):
-        v_cubo, t_cubo = self.scene.cubo
-        v_toro, t_toro = self.scene.toro
-        v_cano, t_cano = self.scene.cano_curvado
+        objetos = []
+        for inst in self.scene.instancias:
+            vertices, topo = self.scene.vertices_mundo(inst)
+            objetos.append((vertices, topo, self._cor_hex(inst)))
 
         if ax is None:
             fig = plt.figure(figsize=(10, 8))
@@ -97,10 +214,8 @@ class Renderer:
             show = False
 
         ax.view_init(elev=25, azim=-45)
-        vertices = {'cubo': v_cubo, 'toro': v_toro, 'cano': v_cano}
-        topologies = {'cubo': t_cubo, 'toro': t_toro, 'cano': t_cano}
 
-        self._plot_scene_shapes(ax, vertices, topologies,
+        self._plot_scene_shapes(ax, objetos,
                                 'Cena Original no Sistema do Mundo',
                                 limits=((0, 10), (0, 10), (0, 10)))
         if show:
@@ -108,15 +223,8 @@ class Renderer:
             plt.show()
 
     def plot_scene_camera(self, ax=None):
-        v_cubo, t_cubo = self.scene.cubo
-        v_toro, t_toro = self.scene.toro
-        v_cano, t_cano = self.scene.cano_curvado
-
-        R = self._compute_camera_matrix(self.eye, self.at, self.up)
-
-        v_cubo_cam = Utils.transform_to_camera(v_cubo, self.eye, R)
-        v_toro_cam = Utils. transform_to_camera(v_toro, self.eye, R)
-        v_cano_cam = Utils. transform_to_camera(v_cano, self.eye, R)
+        objetos = [(v_cam, topo, self._cor_hex(inst))
+                   for inst, v_cam, topo in self._camera_objects(self.eye, self.at, self.up)]
 
         if ax is None:
             fig = plt.figure(figsize=(10, 8))
@@ -126,10 +234,8 @@ class Renderer:
             show = False
 
         ax.view_init(elev=25, azim=-45)
-        vertices = {'cubo': v_cubo_cam, 'toro': v_toro_cam, 'cano': v_cano_cam}
-        topologies = {'cubo': t_cubo, 'toro': t_toro, 'cano': t_cano}
 
-        self._plot_scene_shapes(ax, vertices, topologies,
+        self._plot_scene_shapes(ax, objetos,
                                 "Cena no Sistema de Coordenadas da Câmera",
                                 limits=((-10, 10), (-10, 10), (-15, 5)))
         if show:
@@ -137,27 +243,8 @@ class Renderer:
             plt.show()
 
     def plot_scene_perspective(self, ax=None):
-        v_cubo, t_cubo = self.scene.cubo
-        v_toro, t_toro = self.scene.toro
-        v_cano, t_cano = self.scene.cano_curvado
-
-        R = self._compute_camera_matrix(self.eye, self.at, self.up)
-
-        v_cubo_cam = Utils.transform_to_camera(v_cubo, self.eye, R)
-        v_toro_cam = Utils. transform_to_camera(v_toro, self.eye, R)
-        v_cano_cam = Utils. transform_to_camera(v_cano, self.eye, R)
-
-        def project_list(v_list, d=1):
-            proj = []
-            for v in v_list:
-                p = Utils.perspective_project(v, d)
-                depth = -v[1]
-                proj.append((p[0], p[1], depth))
-            return proj
-
-        proj_cubo = project_list(v_cubo_cam)
-        proj_toro = project_list(v_toro_cam)
-        proj_cano = project_list(v_cano_cam)
+        objetos = [(self._projected_vertices(inst, v_cam), topo, self._cor_hex(inst))
+                   for inst, v_cam, topo in self._camera_objects(self.eye, self.at, self.up)]
 
         if ax is None:
             fig, ax = plt.subplots(figsize=(10, 8))
@@ -165,10 +252,7 @@ class Renderer:
         else:
             show = False
 
-        vertices = {'cubo': proj_cubo, 'toro': proj_toro, 'cano': proj_cano}
-        topologies = {'cubo': t_cubo, 'toro': t_toro, 'cano': t_cano}
-
-        self._plot_scene_shapes(ax, vertices, topologies,
+        self._plot_scene_shapes(ax, objetos,
                                 "Projeção em Perspectiva dos Sólidos (2D)",
                                 limits=((-10, 10), (-10, 10), None),
                                 is_3d=False)
@@ -177,16 +261,13 @@ class Renderer:
             plt.show()
 
     def plot_individual_solidos(self, axes=None):
-        originais = {
-            'cubo': (self.scene.cubo_original.vertices, self.scene.cubo_original.topo),
-            'toro': (self.scene.toro_original.vertices, self.scene.toro_original.topo),
-            'cano': (self.scene.cano_curvado_original.vertices, self.scene.cano_curvado_original.topo),
-        }
+        originais = self.scene.malhas
 
         if axes is None:
-            fig, axes = plt.subplots(1, 3, figsize=(18, 6), # Ajustado para 1x3 para melhor visualização
+            n = len(originais)
+            fig, axes = plt.subplots(1, n, figsize=(6 * n, 6), # Uma coluna por malha (1x3 na cena padrão)
                                      subplot_kw={'projection': '3d'})
-            axes = axes.flatten()
+            axes = axes.flatten() if n > 1 else [axes]
             show = True
         else:
             show = False
@@ -214,9 +295,9 @@ class Renderer:
             ax.set_ylabel("Y")
             ax.set_zlabel("Z")
 
-        plot_solido(axes[0], *originais['cubo'], "Cubo", self.cores['cubo'])
-        plot_solido(axes[1], *originais['toro'], "Toro", self.cores['toro'])
-        plot_solido(axes[2], *originais['cano'], "Cano", self.cores['cano'])
+        for ax, (nome, malha) in zip(axes, originais.items()):
+            plot_solido(ax, malha.vertices, malha.topo, nome.capitalize(),
+                        self.cores.get(nome, '#808080'))
 
         if show:
             plt.tight_layout()
@@ -250,136 +331,400 @@ class Renderer:
         plt.tight_layout()
         plt.show()
 
-    def rasterize_scene_perspective(self, resolution=(1080, 1080), d=1):
-        width, height = resolution
-        cores = self.cores_rgb
-
-        v_cubo, t_cubo = self.scene.cubo
-        v_toro, t_toro = self.scene.toro
-        v_cano, t_cano = self.scene.cano_curvado
-
-        R = self._compute_camera_matrix(self.eye, self.at, self.up)
-        v_cubo_cam = Utils.transform_to_camera(v_cubo, self.eye, R)
-        v_toro_cam = Utils.transform_to_camera(v_toro, self.eye, R)
-        v_cano_cam = Utils. transform_to_camera(v_cano, self.eye, R)
+    def _projected_objects(self, width, height, d=1):
+        """Projeta as instâncias dentro do frustum: lista de (proj, topo, cor, instancia).
+
+        Cada vértice projetado é (x', y', profundidade). O resultado não
+        depende da resolução, só da proporção da imagem (com fov fixo).
+        """
+        # Frustum culling pela BVH da cena: com fov fixo usa os seis planos,
+        # senão apenas o plano próximo (a escala se ajusta ao que sobrar)
+        R = self._camera_cache(self.eye, self.at, self.up)['R']
+        if self.fov is not None:
+            tan_meio = math.tan(math.radians(self.fov) / 2)
+            lado = min(width, height)
+            planos = self._frustum_planes(self.eye, R, tan_meio * width / lado, tan_meio * height / lado)
+        else:
+            planos = self._frustum_planes(self.eye, R)
+        visiveis = self.scene.bvh.consultar_frustum(planos)
 
-        def project_vertices(v_list):
-            proj = []
-            for v in v_list:
-                p = Utils.perspective_project(v, d)
-                depth = -v[2]
-                proj.append((p[0], p[1], depth))
-            return proj
+        return [(self._projected_vertices(inst, v_cam, d), topo, self._cor_rgb(inst), inst)
+                for inst, v_cam, topo in self._camera_objects(self.eye, self.at, self.up, visiveis)]
 
-        proj_cubo = project_vertices(v_cubo_cam)
-        proj_toro = project_vertices(v_toro_cam)
-        proj_cano = project_vertices(v_cano_cam)
+    def _fit_to_image(self, objetos, width, height, d=1):
+        """Escala e deslocamento (scale, tx, ty) das coordenadas projetadas para pixels."""
+        if self.fov is not None:
+            scale = min(width, height) / (2 * d * math.tan(math.radians(self.fov) / 2))
+            return scale, width / 2, height / 2
 
-        all_proj = proj_cubo + proj_toro + proj_cano
-        xs = [p[0] for p in all_proj]
-        ys = [p[1] for p in all_proj]
+        xs = [p[0] for proj, _, _, _ in objetos for p in proj]
+        ys = [p[1] for proj, _, _, _ in objetos for p in proj]
         min_x, max_x = min(xs), max(xs)
         min_y, max_y = min(ys), max(ys)
         scale = 0.8 * min(width / (max_x - min_x) if (max_x - min_x) != 0 else 1,
                            height / (max_y - min_y) if (max_y - min_y) != 0 else 1)
         tx = (width - scale * (max_x + min_x)) / 2
         ty = (height - scale * (max_y + min_y)) / 2
-
+        return scale, tx, ty
+
+    @staticmethod
+    def _rasterize_triangle(pixels, depth_buffer, p0, p1, p2, color,
+                            scale, tx, ty, width, height, y_inicio=0, y_fim=None,
+                            id_buffer=None, objeto=-1, triangulo=-1):
+        """Preenche o triângulo com teste de profundidade; retorna se algum pixel foi escrito.
+
+        Com y_inicio/y_fim só as linhas da faixa [y_inicio, y_fim) são
+        desenhadas, e pixels/depth_buffer são relativos ao início da faixa.
+        Com id_buffer, grava também os índices de objeto e triângulo.
+        """
+        x0, y0 = Utils.to_pixel((p0[0], p0[1]), scale, tx, ty, height)
+        x1, y1 = Utils.to_pixel((p1[0], p1[1]), scale, tx, ty, height)
+        x2, y2 = Utils.to_pixel((p2[0], p2[1]), scale, tx, ty, height)
+        min_x_tri = max(0, min(x0, x1, x2))
+        max_x_tri = min(width - 1, max(x0, x1, x2))
+        min_y_tri = max(y_inicio, min(y0, y1, y2))
+        max_y_tri = min(height if y_fim is None else y_fim, height) - 1
+        max_y_tri = min(max_y_tri, max(y0, y1, y2))
+        den = ((y1 - y2) * (x0 - x2) + (x2 - x1) * (y0 - y2))
+        if den == 0:
+            return False
+        escreveu = False
+        for y in range(min_y_tri, max_y_tri + 1):
+            linha_depth = depth_buffer[y - y_inicio]
+            for x in range(min_x_tri, max_x_tri + 1):
+                u_val = ((y1 - y2) * (x - x2) + (x2 - x1) * (y - y2)) / den
+                v_val = ((y2 - y0) * (x - x2) + (x0 - x2) * (y - y2)) / den
+                w_val = 1 - u_val - v_val
+                if u_val >= 0 and v_val >= 0 and w_val >= 0:
+                    depth = u_val * p0[2] + v_val * p1[2] + w_val * p2[2]
+                    if depth < linha_depth[x]:
+                        linha_depth[x] = depth
+                        pixels[x, y - y_inicio] = color
+                        escreveu = True
+                        if id_buffer is not None:
+                            id_buffer.objeto[y * width + x] = objeto
+                            id_buffer.triangulo[y * width + x] = triangulo
+        return escreveu
+
+    @staticmethod
+    def _draw_visible_edge(pixels, depth_buffer, p0, p1, color,
+                           scale, tx, ty, width, height, y_inicio=0, y_fim=None, tolerance=0.1):
+        (x0, y0), d0 = Utils.to_pixel((p0[0], p0[1]), scale, tx, ty, height), p0[2]
+        (x1, y1), d1 = Utils.to_pixel((p1[0], p1[1]), scale, tx, ty, height), p1[2]
+        dx = x1 - x0
+        dy = y1 - y0
+        steps = max(abs(dx), abs(dy))
+        if steps == 0:
+            return
+        y_fim = height if y_fim is None else min(y_fim, height)
+        for i in range(steps + 1):
+            t_val = i / steps
+            x = int(x0 + dx * t_val)
+            y = int(y0 + dy * t_val)
+            depth = d0 + (d1 - d0) * t_val
+            if 0 <= x < width and y_inicio <= y < y_fim:
+                if abs(depth_buffer[y - y_inicio][x] - depth) < tolerance:
+                    depth_buffer[y - y_inicio][x] = depth
+                    pixels[x, y - y_inicio] = color
+
+    def _draw_triangle_edges(self, pixels, depth_buffer, proj, tri, color,
+                             scale, tx, ty, width, height, y_inicio=0, y_fim=None):
+        p0, p1, p2 = proj[tri[0]], proj[tri[1]], proj[tri[2]]
+        faixa = (scale, tx, ty, width, height, y_inicio, y_fim)
+        self._draw_visible_edge(pixels, depth_buffer, p0, p1, color, *faixa)
+        self._draw_visible_edge(pixels, depth_buffer, p1, p2, color, *faixa)
+        self._draw_visible_edge(pixels, depth_buffer, p2, p0, color, *faixa)
+
+    def rasterize_scene_perspective(self, resolution=(1080, 1080), d=1, ids=False):
+        """Rasteriza a cena em perspectiva.
+
+        Com ids=True retorna (img, IdBuffer): para cada pixel, o objeto e o
+        triângulo visíveis, permitindo picking e máscaras por consulta direta.
+        """
+        width, height = resolution
         img = Image.new('RGB', (width, height), 'white')
-        depth_buffer = [[float('inf')] * width for _ in range(height)]
 
-        def rasterize_triangle(p0, p1, p2, color):
-            x0, y0 = Utils.to_pixel((p0[0], p0[1]), scale, tx, ty, height)
-            x1, y1 = Utils.to_pixel((p1[0], p1[1]), scale, tx, ty, height)
-            x2, y2 = Utils.to_pixel((p2[0], p2[1]), scale, tx, ty, height)
-            min_x_tri = max(0, min(x0, x1, x2))
-            max_x_tri = min(width - 1, max(x0, x1, x2))
-            min_y_tri = max(0, min(y0, y1, y2))
-            max_y_tri = min(height - 1, max(y0, y1, y2))
-            den = ((y1 - y2) * (x0 - x2) + (x2 - x1) * (y0 - y2))
-            if den == 0:
-                return
-            for y in range(min_y_tri, max_y_tri + 1):
-                for x in range(min_x_tri, max_x_tri + 1):
-                    u_val = ((y1 - y2) * (x - x2) + (x2 - x1) * (y - y2)) / den
-                    v_val = ((y2 - y0) * (x - x2) + (x0 - x2) * (y - y2)) / den
-                    w_val = 1 - u_val - v_val
-                    if u_val >= 0 and v_val >= 0 and w_val >= 0:
-                        depth = u_val * p0[2] + v_val * p1[2] + w_val * p2[2]
-                        if depth < depth_buffer[y][x]:
-                            depth_buffer[y][x] = depth
-                            img.putpixel((x, y), color)
-
-        for tri in t_cubo:
-            p0, p1, p2 = proj_cubo[tri[0]], proj_cubo[tri[1]], proj_cubo[tri[2]]
-            rasterize_triangle(p0, p1, p2, cores['cubo'])
-        for tri in t_toro:
-            p0, p1, p2 = proj_toro[tri[0]], proj_toro[tri[1]], proj_toro[tri[2]]
-            rasterize_triangle(p0, p1, p2, cores['toro'])
-        for tri in t_cano:
-            p0, p1, p2 = proj_cano[tri[0]], proj_cano[tri[1]], proj_cano[tri[2]]
-            rasterize_triangle(p0, p1, p2, cores['toro'])
-
-        def rasterize_edge(p0, p1, color):
-            (x0, y0), d0 = Utils.to_pixel((p0[0], p0[1]), scale, tx, ty, height), p0[2]
-            (x1, y1), d1 = Utils.to_pixel((p1[0], p1[1]), scale, tx, ty, height), p1[2]
-            dx = x1 - x0
-            dy = y1 - y0
-            steps = max(abs(dx), abs(dy))
-            if steps == 0:
-                if d0 < depth_buffer[y0][x0]:
-                    depth_buffer[y0][x0] = d0
-                    img.putpixel((x0, y0), color)
-                return
-            for i in range(steps + 1):
-                t_val = i / steps
-                x = int(x0 + dx * t_val)
-                y = int(y0 + dy * t_val)
-                depth = d0 + (d1 - d0) * t_val
-                if 0 <= x < width and 0 <= y < height:
-                    if depth < depth_buffer[y][x]:
-                        depth_buffer[y][x] = depth
-                        img.putpixel((x, y), color)
-
-        def draw_visible_edge(p0, p1, color, tolerance=0.1):
-            (x0, y0), d0 = Utils.to_pixel((p0[0], p0[1]), scale, tx, ty, height), p0[2]
-            (x1, y1), d1 = Utils.to_pixel((p1[0], p1[1]), scale, tx, ty, height), p1[2]
-            dx = x1 - x0
-            dy = y1 - y0
-            steps = max(abs(dx), abs(dy))
-            if steps == 0:
-                return
-            for i in range(steps + 1):
-                t_val = i / steps
-                x = int(x0 + dx * t_val)
-                y = int(y0 + dy * t_val)
-                depth = d0 + (d1 - d0) * t_val
-                if 0 <= x < width and 0 <= y < height:
-                    if abs(depth_buffer[y][x] - depth) < tolerance:
-                        depth_buffer[y][x] = depth
-                        img.putpixel((x, y), color)
-
-        for tri in t_cubo:
-            edge_color = Utils.darker_color(cores['cubo'], factor=0.5)
-            draw_visible_edge(proj_cubo[tri[0]], proj_cubo[tri[1]], edge_color)
-            draw_visible_edge(proj_cubo[tri[1]], proj_cubo[tri[2]], edge_color)
-            draw_visible_edge(proj_cubo[tri[2]], proj_cubo[tri[0]], edge_color)
-        for tri in t_toro:
-            edge_color = Utils.darker_color(cores['toro'], factor=0.5)
-            draw_visible_edge(proj_toro[tri[0]], proj_toro[tri[1]], edge_color)
-            draw_visible_edge(proj_toro[tri[1]], proj_toro[tri[2]], edge_color)
-            draw_visible_edge(proj_toro[tri[2]], proj_toro[tri[0]], edge_color)
-        for tri in t_cano:
-            edge_color = Utils.darker_color(cores['toro'], factor=0.5)
-            draw_visible_edge(proj_cano[tri[0]], proj_cano[tri[1]], edge_color)
-            draw_visible_edge(proj_cano[tri[1]], proj_cano[tri[2]], edge_color)
-            draw_visible_edge(proj_cano[tri[2]], proj_cano[tri[0]], edge_color)
-
-        return img
-
-    def rasterize_at_multiple_resolutions(self, resolutions):
+        objetos = self._projected_objects(width, height, d)
+        id_buffer = IdBuffer(width, height, [inst for _, _, _, inst in objetos]) if ids else None
+        if not objetos:
+            return (img, id_buffer) if ids else img
+        scale, tx, ty = self._fit_to_image(objetos, width, height, d)
+
+        pixels = img.load()
+        depth_buffer = [[float('inf')] * width for _ in range(height)]
+        enquadramento = (scale, tx, ty, width, height)
+
+        for oi, (proj, topo, cor, _) in enumerate(objetos):
+            for ti, tri in enumerate(topo):
+                self._rasterize_triangle(pixels, depth_buffer,
+                                         proj[tri[0]], proj[tri[1]], proj[tri[2]],
+                                         cor, *enquadramento,
+                                         id_buffer=id_buffer, objeto=oi, triangulo=ti)
+
+        for proj, topo, cor, _ in objetos:
+            edge_color = Utils.darker_color(cor, factor=0.5)
+            for tri in topo:
+                self._draw_triangle_edges(pixels, depth_buffer, proj, tri, edge_color, *enquadramento)
+
+        return (img, id_buffer) if ids else img
+
+    def rasterize_scene_strips(self, caminho, resolution=(1080, 1080), d=1, altura_faixa=64):
+        """Rasteriza a cena em faixas horizontais e grava o PNG à medida que avança.
+
+        Os triângulos são distribuídos pelas faixas que cobrem; cada faixa
+        tem sua própria imagem e depth buffer de width x altura_faixa, e as
+        linhas prontas vão direto para o codificador PNG. A memória depende
+        da cena e da altura da faixa, não da resolução final.
+        """
+        width, height = resolution
+        objetos = self._projected_objects(width, height, d)
+        n_faixas = (height + altura_faixa - 1) // altura_faixa
+        faixas = [[] for _ in range(n_faixas)]
+
+        if objetos:
+            scale, tx, ty = self._fit_to_image(objetos, width, height, d)
+            for oi, (proj, topo, _, _) in enumerate(objetos):
+                for ti, tri in enumerate(topo):
+                    ys = [Utils.to_pixel((proj[i][0], proj[i][1]), scale, tx, ty, height)[1] for i in tri]
+                    y_min, y_max = max(0, min(ys)), min(height - 1, max(ys))
+                    for f in range(y_min // altura_faixa, y_max // altura_faixa + 1):
+                        faixas[f].append((oi, ti))
+
+        with PNGStreamWriter(caminho, width, height) as png:
+            for f, triangulos in enumerate(faixas):
+                y_inicio = f * altura_faixa
+                y_fim = min(height, y_inicio + altura_faixa)
+                faixa = Image.new('RGB', (width, y_fim - y_inicio), 'white')
+                if triangulos:
+                    pixels = faixa.load()
+                    depth_buffer = [[float('inf')] * width for _ in range(y_fim - y_inicio)]
+                    enquadramento = (scale, tx, ty, width, height, y_inicio, y_fim)
+                    for oi, ti in triangulos:
+                        proj, topo, cor, _ = objetos[oi]
+                        tri = topo[ti]
+                        self._rasterize_triangle(pixels, depth_buffer,
+                                                 proj[tri[0]], proj[tri[1]], proj[tri[2]],
+                                                 cor, *enquadramento)
+                    for oi, ti in triangulos:
+                        proj, topo, cor, _ = objetos[oi]
+                        self._draw_triangle_edges(pixels, depth_buffer, proj, topo[ti],
+                                                  Utils.darker_color(cor, factor=0.5), *enquadramento)
+                png.escrever_linhas(faixa.tobytes())
+        return caminho
+
+    @staticmethod
+    def _max_depth_tiles(depth_buffer, width, height, bloco):
+        """Maior profundidade de cada bloco bloco x bloco do depth buffer."""
+        tiles = []
+        for y0 in range(0, height, bloco):
+            linhas = depth_buffer[y0:y0 + bloco]
+            tiles.append([max(max(linha[x0:x0 + bloco]) for linha in linhas)
+                          for x0 in range(0, width, bloco)])
+        return tiles
+
+    @staticmethod
+    def _is_occluded(tiles, bloco, proj, tri, scale, tx, ty, width, height, margem=0.0):
+        """Teste conservador: o triângulo fica atrás de tudo nos blocos que cobre."""
+        pontos = [Utils.to_pixel((proj[i][0], proj[i][1]), scale, tx, ty, height) for i in tri]
+        min_x = max(0, min(p[0] for p in pontos))
+        max_x = min(width - 1, max(p[0] for p in pontos))
+        min_y = max(0, min(p[1] for p in pontos))
+        max_y = min(height - 1, max(p[1] for p in pontos))
+        if min_x > max_x or min_y > max_y:
+            return True
+        depth_min = min(proj[i][2] for i in tri) - margem
+        for ty_bloco in range(min_y // bloco, max_y // bloco + 1):
+            linha = tiles[ty_bloco]
+            for tx_bloco in range(min_x // bloco, max_x // bloco + 1):
+                if depth_min <= linha[tx_bloco]:
+                    return False
+        return True
+
+    def _rasterize_stage(self, objetos, w, h, d, visiveis_anterior, bloco,
+                         arestas=True, passo=1, enquadramento=None):
+        """Uma etapa da renderização progressiva; retorna (img, visíveis).
+
+        Os triângulos visíveis na etapa anterior são desenhados primeiro; os
+        demais que ficam inteiramente atrás da profundidade máxima do bloco
+        são descartados sem rasterizar. Com passo > 1 só um a cada `passo`
+        triângulos de cada objeto é considerado, e com arestas=False o
+        contorno não é desenhado (prévias mais baratas).
+        """
+        scale, tx, ty = enquadramento or self._fit_to_image(objetos, w, h, d)
+        enquadramento = (scale, tx, ty, w, h)
+        img = Image.new('RGB', (w, h), 'white')
+        pixels = img.load()
+        depth_buffer = [[float('inf')] * w for _ in range(h)]
+
+        visiveis = set()
+        for oi, ti in visiveis_anterior:
+            proj, topo, cor, _ = objetos[oi]
+            tri = topo[ti]
+            if self._rasterize_triangle(pixels, depth_buffer,
+                                        proj[tri[0]], proj[tri[1]], proj[tri[2]],
+                                        cor, *enquadramento):
+                visiveis.add((oi, ti))
+        tiles = self._max_depth_tiles(depth_buffer, w, h, bloco) if visiveis_anterior else None
+
+        ocultos = set()
+        for oi, (proj, topo, cor, _) in enumerate(objetos):
+            for ti in range(0, len(topo), passo):
+                if (oi, ti) in visiveis_anterior:
+                    continue
+                tri = topo[ti]
+                if tiles is not None and self._is_occluded(tiles, bloco, proj, tri, *enquadramento, margem=0.1):
+                    ocultos.add((oi, ti))
+                    continue
+                if self._rasterize_triangle(pixels, depth_buffer,
+                                            proj[tri[0]], proj[tri[1]], proj[tri[2]],
+                                            cor, *enquadramento):
+                    visiveis.add((oi, ti))
+
+        if arestas:
+            for oi, (proj, topo, cor, _) in enumerate(objetos):
+                edge_color = Utils.darker_color(cor, factor=0.5)
+                for ti in range(0, len(topo), passo):
+                    if (oi, ti) not in ocultos:
+                        self._draw_triangle_edges(pixels, depth_buffer, proj, topo[ti], edge_color, *enquadramento)
+        return img, visiveis
+
+    def _stage_cost(self, objetos, width, height, d):
+        """Custo de uma etapa por triângulo: (ms fixos, ms por pixel, ms das arestas).
+
+        Medido uma vez, em passagens minúsculas sobre uma amostra de até
+        AMOSTRA_CUSTO triângulos, e guardado no renderizador para as chamadas
+        seguintes. O custo por pixel é por triângulo porque a área coberta
+        cresce com o número de triângulos.
+        """
+        if self._custo_etapa is None:
+            n_triangulos = sum(len(topo) for _, topo, _, _ in objetos)
+            passo = max(1, n_triangulos // AMOSTRA_CUSTO)
+            amostra = [(proj, topo[::passo], cor, inst) for proj, topo, cor, inst in objetos]
+            n_amostra = max(1, sum(len(topo) for _, topo, _, _ in amostra))
+            scale, tx, ty = self._fit_to_image(objetos, width, height, d)
+
+            def medir(lado, arestas):
+                reducao = max(width, height) / lado
+                w, h = max(1, round(width / reducao)), max(1, round(height / reducao))
+                inicio = time.perf_counter()
+                self._rasterize_stage(amostra, w, h, d, set(), 8, arestas=arestas,
+                                      enquadramento=(scale / reducao, tx / reducao, ty / reducao))
+                return w * h, 1000 * (time.perf_counter() - inicio) / n_amostra
+
+            p1, t1 = medir(8, False)
+            p2, t2 = medir(128, False)
+            _, t3 = medir(8, True)
+            por_pixel = max(0.0, (t2 - t1) / (p2 - p1)) if p2 > p1 else 0.0
+            self._custo_etapa = (max(0.0, t1 - por_pixel * p1), por_pixel, max(0.0, t3 - t1))
+        return self._custo_etapa
+
+    def _budget_factors(self, objetos, width, height, d, fatores, orcamento_ms, inicio):
+        """Ajusta a renderização progressiva para que a primeira etapa caiba no orçamento.
+
+        Considera os fatores dados e, além do mais grosseiro, seus dobros até
+        uma imagem de 1 pixel; a primeira etapa passa a ser a mais fina cujo
+        custo estimado cabe no tempo que resta, seguida dos fatores dados que
+        são mais finos que ela. Se nem a mais grosseira couber, ela é feita
+        sem arestas e, se ainda for preciso, com só uma parte dos triângulos.
+        Retorna (fatores, opções de _rasterize_stage da primeira etapa).
+        """
+        fixo, por_pixel, por_aresta = self._stage_cost(objetos, width, height, d)
+        n_triangulos = sum(len(topo) for _, topo, _, _ in objetos)
+        # Folga de 20% para o erro da estimativa
+        restante = 0.8 * (orcamento_ms - 1000 * (time.perf_counter() - inicio))
+
+        extras = []
+        fator = fatores[0] * 2
+        while fator <= max(width, height):
+            extras.insert(0, fator)
+            fator *= 2
+        candidatos = extras + list(fatores)
+
+        def custo(fator, arestas):
+            w, h = max(1, width // fator), max(1, height // fator)
+            return n_triangulos * (fixo + por_pixel * w * h + (por_aresta if arestas else 0.0))
+
+        for fator in reversed(candidatos):
+            if custo(fator, True) <= restante:
+                return [fator] + [f for f in fatores if f < fator], {}
+
+        escolhido = candidatos[0]
+        opcoes = {'arestas': False}
+        sem_arestas = custo(escolhido, False)
+        if sem_arestas > restante:
+            opcoes['passo'] = min(max(1, n_triangulos), math.ceil(sem_arestas / max(restante, 1e-3)))
+        return [escolhido] + [f for f in fatores if f < escolhido], opcoes
+
+    def rasterize_scene_progressive(self, resolution=(1080, 1080), d=1, fatores=(8, 4, 2, 1), bloco=8,
+                                    orcamento_ms=None):
+        """Gera imagens da cena da mais grosseira à resolução final.
+
+        Cada etapa rasteriza em resolution / fator e é entregue ampliada para
+        `resolution`, de modo que a primeira prévia sai quase de imediato. A
+        projeção é feita uma única vez. A partir da segunda etapa, os
+        triângulos que apareceram na etapa anterior são desenhados primeiro;
+        com a profundidade máxima por bloco resultante, os demais triângulos
+        que ficam inteiramente atrás são descartados sem rasterizar.
+        Com `orcamento_ms`, a primeira etapa é escolhida (ou criada, mais
+        grosseira que fatores[0]) para sair dentro desse tempo, e em último
+        caso sai sem arestas e com parte dos triângulos; ver _budget_factors.
+        A estimativa de custo (_stage_cost) é medida numa amostra pequena de
+        triângulos, mas a projeção e o enquadramento percorrem a cena toda e
+        não são limitados pelo orçamento.
+        Basta parar de consumir o gerador para cancelar.
+        """
+        inicio = time.perf_counter()
+        width, height = resolution
+        objetos = self._projected_objects(width, height, d)
+        if not objetos:
+            yield Image.new('RGB', (width, height), 'white')
+            return
+        opcoes = {}
+        if orcamento_ms is not None:
+            fatores, opcoes = self._budget_factors(objetos, width, height, d, fatores, orcamento_ms, inicio)
+
+        visiveis_anterior = set()
+        for fator in fatores:
+            w, h = max(1, width // fator), max(1, height // fator)
+            img, visiveis_anterior = self._rasterize_stage(objetos, w, h, d, visiveis_anterior, bloco, **opcoes)
+            opcoes = {}  # Só a primeira etapa é simplificada
+            yield img if (w, h) == (width, height) else img.resize((width, height), Image.NEAREST)
+
+    def rasterize_pyramid(self, resolutions, d=1, supersample=1, filtro='lanczos'):
+        """Rasteriza uma única vez e deriva todas as resoluções por reamostragem.
+
+        A imagem mestre tem a maior resolução pedida multiplicada por
+        `supersample`; cada resolução sai dela com o filtro escolhido (ver
+        FILTROS), o que também suaviza o serrilhado das menores. As
+        resoluções devem ter a mesma proporção. Retorna {resolucao: img}.
+        """
+        if filtro not in FILTROS:
+            raise ValueError(f"Filtro desconhecido: {filtro}")
+        resolutions = [tuple(res) for res in resolutions]
+        largura, altura = max(resolutions)
+        for w, h in resolutions:
+            if abs(w * altura - h * largura) > max(largura, altura):
+                raise ValueError(f"Proporção de {w}x{h} difere de {largura}x{altura}")
+
+        mestre = self.rasterize_scene_perspective(
+            resolution=(largura * supersample, altura * supersample), d=d)
+        return {res: mestre if res == mestre.size else mestre.resize(res, FILTROS[filtro])
+                for res in resolutions}
+
+    def rasterize_at_multiple_resolutions(self, resolutions, piramide=False, supersample=1, filtro='lanczos'):
+        """Salva a cena em cada resolução.
+
+        Com piramide=True, rasteriza uma vez só (ver rasterize_pyramid) em
+        vez de uma vez por resolução.
+        """
+        if piramide:
+            imagens = self.rasterize_pyramid(resolutions, supersample=supersample, filtro=filtro)
         for res in resolutions:
-            img = self.rasterize_scene_perspective(resolution=res)
+            if piramide:
+                img = imagens[tuple(res)]
+            else:
+                # Uma imagem por vez: renderiza, salva e descarta
+                img = self.rasterize_scene_perspective(resolution=res)
             filename = f"output/raster_perspective_{res[0]}x{res[1]}.png"
             img.save(filename)
             print(f"Imagem salva: {filename}")
\ No newline at end of file
@@ -19,6 +19,60 @@ class Utils:
             transformed.append(v_cam)
         return transformed
 
+    @staticmethod
+    def _camera_affine(escala, translacao, E, R):
+        """Combina escala, translação e câmera: v_cam = A * v + b."""
+        shift = [translacao[i] - E[i] for i in range(3)]
+        A = [[R[r][c] * escala[c] for c in range(3)] for r in range(3)]
+        b = [R[r][0] * shift[0] + R[r][1] * shift[1] + R[r][2] * shift[2]
+             for r in range(3)]
+        return A, b
+
+    @staticmethod
+    def transform_instances_to_camera(vertices, transformacoes, E, R):
+        """Leva todas as instâncias de uma mesma malha ao sistema da câmera.
+
+        `transformacoes` é uma lista de pares (escala, translacao). Escala,
+        translação e câmera são combinadas numa única transformação afim por
+        instância, e a malha compartilhada é percorrida sem gerar cópias no
+        sistema do mundo.
+        """
+        resultado = []
+        for escala, translacao in transformacoes:
+            ((a00, a01, a02), (a10, a11, a12), (a20, a21, a22)), (b0, b1, b2) = \
+                Utils._camera_affine(escala, translacao, E, R)
+            resultado.append([
+                [a00 * x + a01 * y + a02 * z + b0,
+                 a10 * x + a11 * y + a12 * z + b1,
+                 a20 * x + a21 * y + a22 * z + b2]
+                for x, y, z in vertices
+            ])
+        return resultado
+
+    @staticmethod
+    def transform_quantized_instances_to_camera(posicoes, origem, passo, transformacoes, E, R):
+        """Como transform_instances_to_camera, para posições quantizadas.
+
+        `posicoes` é o array plano (x, y, z, ...) de inteiros com
+        v = origem + passo * q; a dequantização entra na escala e na
+        translação de cada instância, então os inteiros vão direto para o
+        sistema da câmera.
+        """
+        xs, ys, zs = posicoes[0::3], posicoes[1::3], posicoes[2::3]
+        resultado = []
+        for escala, translacao in transformacoes:
+            escala_q = [escala[k] * passo[k] for k in range(3)]
+            translacao_q = [translacao[k] + escala[k] * origem[k] for k in range(3)]
+            ((a00, a01, a02), (a10, a11, a12), (a20, a21, a22)), (b0, b1, b2) = \
+                Utils._camera_affine(escala_q, translacao_q, E, R)
+            resultado.append([
+                [a00 * x + a01 * y + a02 * z + b0,
+                 a10 * x + a11 * y + a12 * z + b1,
+                 a20 * x + a21 * y + a22 * z + b2]
+                for x, y, z in zip(xs, ys, zs)
+            ])
+        return resultado
+
     @staticmethod
     def perspective_project(v, d=1):
         x, y, z = v
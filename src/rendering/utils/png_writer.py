@@ -0,0 +1,62 @@
+import struct
+import zlib
+
+class PNGStreamWriter:
+    """Codificador PNG (RGB, 8 bits) que recebe a imagem linha a linha.
+
+    As linhas são comprimidas à medida que chegam e gravadas em blocos IDAT,
+    então a memória usada não depende da altura da imagem.
+    """
+    TAMANHO_IDAT = 1 << 16
+
+    def __init__(self, caminho, width, height, nivel=6):
+        self.width = width
+        self.height = height
+        self.linhas_escritas = 0
+        self._arquivo = open(caminho, 'wb')
+        self._compressor = zlib.compressobj(nivel)
+        self._pendente = bytearray()
+
+        self._arquivo.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.fechar()
+        else:
+            self._arquivo.close()
+
+    def _chunk(self, tipo, dados):
+        self._arquivo.write(struct.pack('>I', len(dados)))
+        self._arquivo.write(tipo)
+        self._arquivo.write(dados)
+        self._arquivo.write(struct.pack('>I', zlib.crc32(dados, zlib.crc32(tipo))))
+
+    def _descarregar(self, tudo=False):
+        while len(self._pendente) >= self.TAMANHO_IDAT or (tudo and self._pendente):
+            self._chunk(b'IDAT', bytes(self._pendente[:self.TAMANHO_IDAT]))
+            del self._pendente[:self.TAMANHO_IDAT]
+
+    def escrever_linhas(self, dados):
+        """Recebe linhas RGB consecutivas (width * 3 bytes cada)."""
+        tamanho_linha = self.width * 3
+        if len(dados) % tamanho_linha != 0:
+            raise ValueError("Os dados devem conter linhas completas")
+        for inicio in range(0, len(dados), tamanho_linha):
+            # Filtro 0 (nenhum) no início de cada linha
+            self._pendente += self._compressor.compress(b'\x00')
+            self._pendente += self._compressor.compress(dados[inicio:inicio + tamanho_linha])
+            self.linhas_escritas += 1
+        self._descarregar()
+
+    def fechar(self):
+        if self.linhas_escritas != self.height:
+            self._arquivo.close()
+            raise ValueError(f"PNG incompleto: {self.linhas_escritas} de {self.height} linhas")
+        self._pendente += self._compressor.flush()
+        self._descarregar(tudo=True)
+        self._chunk(b'IEND', b'')
+        self._arquivo.close()
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from models.scene import Scene
+from rendering.renderer import Renderer
+
+# --- LADO DO WORKER ---
+# Cada processo do pool mantém suas cenas (malhas e BVH) e, no cache do
+# Renderer, as últimas transformações de câmera, de um job para o outro.
+# Cada câmera guarda os vértices de todas as instâncias, então o cache é
+# pequeno: a memória cresce com instâncias x câmeras.
+MAX_CAMERAS_WORKER = 4
+
+_renderers = {}  # arquivo de cena (None = cena padrão) -> Renderer
+
+def _renderer_da_cena(cena):
+    if cena not in _renderers:
+        renderer = Renderer(Scene(cena))
+        renderer.max_cameras_cache = MAX_CAMERAS_WORKER
+        _renderers[cena] = renderer
+    return _renderers[cena]
+
+def _iniciar_worker():
+    # Constrói a cena padrão logo na criação do processo
+    _renderer_da_cena(None)
+
+def _renderizar_job(cena, camera, resolucao, saida):
+    """Renderiza um job num worker; retorna o dicionário de resposta."""
+    renderer = _renderer_da_cena(cena)
+    renderer.eye, renderer.at, renderer.up, renderer.fov = camera
+    inicio = time.perf_counter()
+    try:
+        img = renderer.rasterize_scene_perspective(resolution=tuple(resolucao))
+        img.save(saida)
+        return {'ok': True, 'saida': saida, 'tempo': time.perf_counter() - inicio}
+    except Exception as e:
+        return {'ok': False, 'saida': saida, 'erro': str(e)}
+
+# --- LADO DO SERVIDOR ---
+
+class RenderService:
+    """Serviço de renderização de longa duração.
+
+    Recebe jobs como linhas JSON numa porta local (ou socket Unix) e
+    responde uma linha JSON por job, na ordem de chegada da conexão:
+
+        {"cena": null, "eye": [5, -5, 10], "at": [5, 5, 0], "up": [0, 0, 1],
+         "fov": null, "resolucao": [360, 360], "saida": "output/a.png"}
+
+    Jobs com a mesma cena e câmera que chegam dentro de `janela_lote`
+    segundos são agrupados e submetidos juntos ao pool, um job por tarefa;
+    os workers guardam a transformação de câmera entre os jobs.
+    """
+    PADRAO_CAMERA = {'eye': [5, -5, 10], 'at': [5, 5, 0], 'up': [0, 0, 1], 'fov': None}
+
+    def __init__(self, host='127.0.0.1', porta=8765, caminho_unix=None,
+                 workers=None, janela_lote=0.005, max_lote=32):
+        self.host = host
+        self.porta = porta
+        self.caminho_unix = caminho_unix
+        self.workers = workers or os.cpu_count() or 1
+        self.janela_lote = janela_lote
+        self.max_lote = max_lote
+        self._fila = None
+        self._pool = None
+        self._server = None
+        self._agrupador = None
+        self._tarefas = set()  # Lotes em andamento; referências fortes até terminarem
+
+    @staticmethod
+    def _chave_lote(job):
+        """(cena, câmera) do job; só chamada depois de _validar."""
+        camera = RenderService.PADRAO_CAMERA
+        return (job.get('cena'),
+                tuple(tuple(float(c) for c in job.get(k, camera[k])) for k in ('eye', 'at', 'up'))
+                + (job.get('fov', camera['fov']),))
+
+    async def iniciar(self):
+        self._fila = asyncio.Queue()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                         initializer=_iniciar_worker)
+        if self.caminho_unix is not None:
+            self._server = await asyncio.start_unix_server(self._atender, path=self.caminho_unix)
+        else:
+            self._server = await asyncio.start_server(self._atender, self.host, self.porta)
+        self._agrupador = asyncio.create_task(self._agrupar())
+        return self._server
+
+    async def servir(self):
+        await self.iniciar()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self.fechar()
+
+    async def fechar(self):
+        if self._server is not None:
+            self._server.close()
+        if self._agrupador is not None:
+            self._agrupador.cancel()
+            try:
+                await self._agrupador
+            except asyncio.CancelledError:
+                pass
+            self._agrupador = None
+        for tarefa in list(self._tarefas):
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        if self._pool is not None:
+            # shutdown() espera os workers; roda fora do loop para não travá-lo
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: pool.shutdown(cancel_futures=True))
+
+    async def _atender(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        pendentes = asyncio.Queue()
+
+        async def responder():
+            conectado = True
+            while True:
+                futuro = await pendentes.get()
+                if futuro is None:
+                    break
+                resposta = await futuro
+                if not conectado:
+                    continue  # Cliente saiu: só esvazia os jobs em andamento
+                try:
+                    writer.write((json.dumps(resposta) + '\n').encode())
+                    await writer.drain()
+                except ConnectionError:
+                    conectado = False
+
+        escritor = asyncio.create_task(responder())
+        try:
+            while True:
+                try:
+                    linha = await reader.readline()
+                except ConnectionError:
+                    break
+                if not linha:
+                    break
+                futuro = loop.create_future()
+                try:
+                    job = json.loads(linha)
+                    self._validar(job)
+                    chave = self._chave_lote(job)
+                except (ValueError, KeyError, TypeError) as e:
+                    futuro.set_result({'ok': False, 'erro': f"Job inválido: {e}"})
+                else:
+                    await self._fila.put((chave, job, futuro))
+                await pendentes.put(futuro)
+        finally:
+            try:
+                await pendentes.put(None)
+                await escritor
+            finally:
+                writer.close()
+
+    @staticmethod
+    def _numero(valor):
+        return isinstance(valor, (int, float)) and not isinstance(valor, bool)
+
+    @staticmethod
+    def _validar(job):
+        if not isinstance(job, dict):
+            raise ValueError("o job deve ser um objeto JSON")
+        resolucao = job['resolucao']
+        if (not isinstance(resolucao, list) or len(resolucao) != 2
+                or not all(isinstance(x, int) and not isinstance(x, bool) for x in resolucao)):
+            raise ValueError("resolucao deve ser [largura, altura] inteiros")
+        largura, altura = resolucao
+        if largura <= 0 or altura <= 0:
+            raise ValueError("resolução deve ser positiva")
+        if not isinstance(job['saida'], str):
+            raise ValueError("saida deve ser um caminho")
+        for k in ('eye', 'at', 'up'):
+            if k in job:
+                v = job[k]
+                if not isinstance(v, list) or len(v) != 3 or not all(map(RenderService._numero, v)):
+                    raise ValueError(f"{k} deve ser uma lista de 3 números")
+        fov = job.get('fov')
+        if fov is not None and not (RenderService._numero(fov) and 0 < fov < 180):
+            raise ValueError("fov deve ser null ou um número entre 0 e 180")
+        cena = job.get('cena')
+        if cena is not None and not isinstance(cena, str):
+            raise ValueError("cena deve ser null ou um caminho")
+
+    async def _agrupar(self):
+        """Junta os jobs que chegam numa janela curta e despacha por lote."""
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self._fila.get()]
+            try:
+                limite = loop.time() + self.janela_lote
+                while len(jobs) < self.max_lote:
+                    restante = limite - loop.time()
+                    if restante <= 0:
+                        break
+                    try:
+                        jobs.append(await asyncio.wait_for(self._fila.get(), restante))
+                    except asyncio.TimeoutError:
+                        break
+
+                lotes = {}
+                for chave, job, futuro in jobs:
+                    lotes.setdefault(chave, []).append((job, futuro))
+                for (cena, camera), lote in lotes.items():
+                    tarefa = asyncio.create_task(self._despachar(cena, camera, lote))
+                    self._tarefas.add(tarefa)
+                    tarefa.add_done_callback(self._tarefas.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Uma falha ao agrupar não pode derrubar o serviço
+                for _, _, futuro in jobs:
+                    if not futuro.done():
+                        futuro.set_result({'ok': False, 'erro': str(e)})
+
+    async def _despachar(self, cena, camera, lote):
+        """Envia os jobs de um lote ao pool, um por tarefa.
+
+        Os jobs do lote são submetidos juntos, então se espalham pelos
+        workers livres em vez de esperar uns pelos outros num só; cada
+        resposta sai assim que o seu job termina.
+        """
+        await asyncio.gather(*(self._renderizar(cena, camera, job, futuro)
+                               for job, futuro in lote))
+
+    async def _renderizar(self, cena, camera, job, futuro):
+        loop = asyncio.get_running_loop()
+        try:
+            resposta = await loop.run_in_executor(
+                self._pool, _renderizar_job, cena, camera, job['resolucao'], job['saida'])
+        except asyncio.CancelledError:
+            if not futuro.done():
+                futuro.set_result({'ok': False, 'saida': job['saida'], 'erro': "Serviço encerrado"})
+            raise
+        except Exception as e:
+            resposta = {'ok': False, 'saida': job['saida'], 'erro': str(e)}
+        if not futuro.done():
+            futuro.set_result(resposta)
+
+def enviar_jobs(jobs, host='127.0.0.1', porta=8765, caminho_unix=None):
+    """Cliente simples: envia jobs ao serviço e retorna as respostas."""
+    if caminho_unix is not None:
+        conexao = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conexao.connect(caminho_unix)
+    else:
+        conexao = socket.create_connection((host, porta))
+    with conexao, conexao.makefile('rw', encoding='utf-8') as arquivo:
+        for job in jobs:
+            arquivo.write(json.dumps(job) + '\n')
+        arquivo.flush()
+        return [json.loads(arquivo.readline()) for _ in jobs]